@@ -13,10 +13,12 @@
 
 """This module contains base classes for models defined in the models subpackage."""
 import logging
+from array import array
 from collections import namedtuple
 
 import numpy as np
-from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+from scipy.sparse import coo_matrix
+from sklearn.metrics import accuracy_score, f1_score
 from sklearn.metrics import precision_recall_fscore_support as score
 
 from .helpers import (
@@ -68,10 +70,10 @@ class RawResults:
         expected (list): Same as predicted but contains the true or gold values.
         text_labels (list): A list of all the text label values, the index of the text label in
                              this array is the numeric label
-        predicted_flat (list): (Optional): For sequence models this is a flattened list of all
-                                predicted tags (1d array)
-        expected_flat (list): (Optional): For sequence models this is a flattened list of all gold
-                              tags
+        predicted_flat (numpy.ndarray): (Optional): For sequence models this is a flattened 1d
+                                         array of all predicted tags
+        expected_flat (numpy.ndarray): (Optional): For sequence models this is a flattened 1d
+                                        array of all gold tags
     """
 
     def __init__(
@@ -94,8 +96,12 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
     """
 
     def __init__(self, config, results):
-        del results
         self.label_encoder = get_label_encoder(config)
+        # whether each result is correct is computed once and shared by the accuracy and
+        # correct/incorrect result accessors
+        self._correct_mask = np.fromiter(
+            (result.is_correct for result in results), dtype=bool, count=len(results)
+        )
 
     def get_accuracy(self):
         """The accuracy represents the share of examples whose predicted labels
@@ -104,13 +110,13 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
         Returns:
             float: The accuracy of the model.
         """
-        num_examples = len(self.results)
-        num_correct = len([e for e in self.results if e.is_correct])
-        return float(num_correct) / float(num_examples)
+        if not len(self._correct_mask):
+            return 0.0
+        return float(self._correct_mask.mean())
 
     def __repr__(self):
         num_examples = len(self.results)
-        num_correct = len(list(self.correct_results()))
+        num_correct = int(self._correct_mask.sum())
         accuracy = self.get_accuracy()
         msg = "<{} score: {:.2%}, {} of {} example{} correct>"
         return msg.format(
@@ -126,18 +132,16 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
         Returns:
             iterable: Collection of the examples which were correct
         """
-        for result in self.results:
-            if result.is_correct:
-                yield result
+        for index in np.flatnonzero(self._correct_mask):
+            yield self.results[index]
 
     def incorrect_results(self):
         """
         Returns:
             iterable: Collection of the examples which were incorrect
         """
-        for result in self.results:
-            if not result.is_correct:
-                yield result
+        for index in np.flatnonzero(~self._correct_mask):
+            yield self.results[index]
 
     def get_stats(self):
         """
@@ -176,19 +180,29 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
         raise NotImplementedError
 
     @staticmethod
-    def _update_raw_result(label, text_labels, vec):
+    def _update_raw_result(label, text_labels, vec, label_indices):
         """
         Helper method for updating the text to numeric label vectors
 
+        Args:
+            label: The text label to append to the label vector
+            text_labels (list): The text labels seen so far
+            vec (list): The label vector to update
+            label_indices (dict): Maps each label in text_labels to its index, updated \
+                alongside text_labels
+
         Returns:
             (tuple): tuple containing:
 
                 * text_labels: The updated text_labels array
                 * vec: The updated label vector with the given label appended
         """
-        if label not in text_labels:
+        index = label_indices.get(label)
+        if index is None:
+            index = len(text_labels)
+            label_indices[label] = index
             text_labels.append(label)
-        vec.append(text_labels.index(label))
+        vec.append(index)
         return text_labels, vec
 
     def _get_common_stats(self, raw_expected, raw_predicted, text_labels):
@@ -199,23 +213,27 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
             dict: Structured dict containing evaluation statistics. Contains precision, \
                   recall, f scores, support, etc.
         """
-        labels = range(len(text_labels))
+        # every text label is scored, the numeric label of a text label is its index
+        labels = np.arange(len(text_labels))
 
         confusion_stats = self._get_confusion_matrix_and_counts(
-            y_true=raw_expected, y_pred=raw_predicted
+            y_true=raw_expected, y_pred=raw_predicted, num_classes=len(labels)
         )
-        stats_overall = self._get_overall_stats(
+        class_stats = self._get_class_stats(
             y_true=raw_expected, y_pred=raw_predicted, labels=labels
         )
+        stats_overall = self._get_overall_stats(
+            y_true=raw_expected,
+            y_pred=raw_predicted,
+            labels=labels,
+            class_stats=class_stats,
+        )
         counts_overall = confusion_stats["counts_overall"]
         stats_overall["tp"] = counts_overall.tp
         stats_overall["tn"] = counts_overall.tn
         stats_overall["fp"] = counts_overall.fp
         stats_overall["fn"] = counts_overall.fn
 
-        class_stats = self._get_class_stats(
-            y_true=raw_expected, y_pred=raw_predicted, labels=labels
-        )
         counts_by_class = confusion_stats["counts_by_class"]
 
         class_stats["tp"] = counts_by_class.tp
@@ -252,20 +270,26 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
         return stats
 
     @staticmethod
-    def _get_overall_stats(y_true, y_pred, labels):
+    def _get_overall_stats(y_true, y_pred, labels, class_stats=None):
         """
         Method for getting some overall statistics.
 
+        Args:
+            class_stats (dict, optional): The per class stats from ``_get_class_stats`` for the \
+                same labels. When given, the macro and weighted f1 scores are averaged from \
+                them instead of scoring the predictions again.
+
         Returns:
             dict: A structured dictionary containing scalar values for f1 scores and overall \
                   accuracy.
         """
-        f1_weighted = f1_score(
-            y_true=y_true, y_pred=y_pred, labels=labels, average="weighted"
-        )
-        f1_macro = f1_score(
-            y_true=y_true, y_pred=y_pred, labels=labels, average="macro"
-        )
+        if class_stats is None:
+            class_stats = ModelEvaluation._get_class_stats(y_true, y_pred, labels)
+        f_beta = class_stats["f_beta"]
+        support = class_stats["support"]
+        f1_macro = f_beta.mean() if len(f_beta) else 0.0
+        # sklearn scores the weighted average as 0 when no label has support
+        f1_weighted = np.average(f_beta, weights=support) if support.sum() else 0.0
         f1_micro = f1_score(
             y_true=y_true, y_pred=y_pred, labels=labels, average="micro"
         )
@@ -280,43 +304,42 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
         return stats_overall
 
     @staticmethod
-    def _get_confusion_matrix_and_counts(y_true, y_pred):
+    def _get_confusion_matrix_and_counts(y_true, y_pred, num_classes=None):
         """
         Generates the confusion matrix where each element Cij is the number of observations known to
         be in group i predicted to be in group j
 
+        Args:
+            y_true (list): The numeric gold labels
+            y_pred (list): The numeric predicted labels
+            num_classes (int, optional): The number of classes. Defaults to one more than the \
+                largest label
+
         Returns:
             dict: Contains 2d array of the confusion matrix, and an array of tp, tn, fp, fn values
         """
-        confusion_mat = confusion_matrix(y_true=y_true, y_pred=y_pred)
-        tp_arr, tn_arr, fp_arr, fn_arr = [], [], [], []
-
-        num_classes = len(confusion_mat)
-        for class_index in range(num_classes):
-            # tp is C_classindex, classindex
-            tp = confusion_mat[class_index][class_index]
-            tp_arr.append(tp)
-
-            # tn is the sum of Cij where i or j are not class_index
-            mask = np.ones((num_classes, num_classes))
-            mask[:, class_index] = 0
-            mask[class_index, :] = 0
-            tn = np.sum(mask * confusion_mat)
-            tn_arr.append(tn)
-
-            # fp is the sum of Cij where j is class_index but i is not
-            mask = np.zeros((num_classes, num_classes))
-            mask[:, class_index] = 1
-            mask[class_index, class_index] = 0
-            fp = np.sum(mask * confusion_mat)
-            fp_arr.append(fp)
-
-            # fn is the sum of Cij where i is class_index but j is not
-            mask = np.zeros((num_classes, num_classes))
-            mask[class_index, :] = 1
-            mask[class_index, class_index] = 0
-            fn = np.sum(mask * confusion_mat)
-            fn_arr.append(fn)
+        y_true = np.asarray(y_true)
+        y_pred = np.asarray(y_pred)
+        if num_classes is None:
+            num_classes = max(y_true.max(), y_pred.max()) + 1
+
+        # the counts are computed from a sparse matrix built directly from the label vectors,
+        # which only touches the non-zero cells when there are many classes
+        sparse_confusion_mat = coo_matrix(
+            (np.ones(len(y_true), dtype=np.int64), (y_true, y_pred)),
+            shape=(num_classes, num_classes),
+        ).tocsr()
+        confusion_mat = sparse_confusion_mat.toarray()
+
+        # tp is C_classindex, classindex
+        tp = sparse_confusion_mat.diagonal()
+        # fp is the sum of Cij where j is class_index but i is not
+        fp = np.asarray(sparse_confusion_mat.sum(axis=0)).ravel() - tp
+        # fn is the sum of Cij where i is class_index but j is not
+        fn = np.asarray(sparse_confusion_mat.sum(axis=1)).ravel() - tp
+        # tn is the sum of Cij where i or j are not class_index
+        tn = len(y_true) - tp - fp - fn
+        tp_arr, tn_arr, fp_arr, fn_arr = tp.tolist(), tn.tolist(), fp.tolist(), fn.tolist()
 
         Counts = namedtuple("Counts", ["tp", "tn", "fp", "fn"])
         return {
@@ -378,12 +401,9 @@ class ModelEvaluation(namedtuple("ModelEvaluation", ["config", "results"])):
                 " included in the dictionary returned from get_stats()."
             )
             return
-        labels = range(len(text_labels))
-        title_format = "{:>15}" * (len(labels) + 1)
-        stat_row_format = "{:>15}" * (len(labels) + 1)
-        table_titles = [
-            self._truncate_label(text_labels[label], 10) for label in labels
-        ]
+        title_format = "{:>15}" * (len(text_labels) + 1)
+        stat_row_format = "{:>15}" * (len(text_labels) + 1)
+        table_titles = [self._truncate_label(label, 10) for label in text_labels]
         print("Confusion matrix: \n")
         print(title_format.format("", *table_titles))
         for label_index, label in enumerate(text_labels):
@@ -429,14 +449,15 @@ class StandardModelEvaluation(ModelEvaluation):
     def raw_results(self):
         """Returns the raw results of the model evaluation"""
         text_labels = []
+        label_indices = {}
         predicted, expected = [], []
 
         for result in self.results:
             text_labels, predicted = self._update_raw_result(
-                result.predicted, text_labels, predicted
+                result.predicted, text_labels, predicted, label_indices
             )
             text_labels, expected = self._update_raw_result(
-                result.expected, text_labels, expected
+                result.expected, text_labels, expected, label_indices
             )
 
         return RawResults(
@@ -471,33 +492,41 @@ class SequenceModelEvaluation(ModelEvaluation):
     def raw_results(self):
         """Returns the raw results of the model evaluation"""
         text_labels = []
+        label_indices = {}
         predicted, expected = [], []
-        predicted_flat, expected_flat = [], []
+        # flat tag indices are pushed into C int buffers, not lists of python ints
+        predicted_flat, expected_flat = array("i"), array("i")
 
-        for result in self.results:
-            raw_predicted = self.label_encoder.encode(
-                [result.predicted], examples=[result.example]
-            )[0]
-            raw_expected = self.label_encoder.encode(
-                [result.expected], examples=[result.example]
-            )[0]
+        # encode the labels of all results with one call per label set
+        examples = [result.example for result in self.results]
+        all_raw_predicted = self.label_encoder.encode(
+            [result.predicted for result in self.results], examples=examples
+        )
+        all_raw_expected = self.label_encoder.encode(
+            [result.expected for result in self.results], examples=examples
+        )
 
+        for raw_predicted, raw_expected in zip(all_raw_predicted, all_raw_expected):
             vec = []
             for entity in raw_predicted:
-                text_labels, vec = self._update_raw_result(entity, text_labels, vec)
+                text_labels, vec = self._update_raw_result(
+                    entity, text_labels, vec, label_indices
+                )
             predicted.append(vec)
             predicted_flat.extend(vec)
             vec = []
             for entity in raw_expected:
-                text_labels, vec = self._update_raw_result(entity, text_labels, vec)
+                text_labels, vec = self._update_raw_result(
+                    entity, text_labels, vec, label_indices
+                )
             expected.append(vec)
             expected_flat.extend(vec)
         return RawResults(
             predicted=predicted,
             expected=expected,
             text_labels=text_labels,
-            predicted_flat=predicted_flat,
-            expected_flat=expected_flat,
+            predicted_flat=np.frombuffer(predicted_flat, dtype=np.intc),
+            expected_flat=np.frombuffer(expected_flat, dtype=np.intc),
         )
 
     def _get_sequence_stats(self):
@@ -77,9 +77,14 @@ class EntityLabelEncoder(LabelEncoder):
         """
         self.config = config
         self.system_entity_recognizer = SystemEntityRecognizer.get_instance()
+        self._tag_scheme = self._get_tag_scheme()
 
     def _get_tag_scheme(self):
-        return self.config.model_settings.get("tag_scheme", "IOB").upper()
+        # encoders pickled by previous versions do not have the cached scheme
+        tag_scheme = getattr(self, "_tag_scheme", None)
+        if tag_scheme is None:
+            tag_scheme = self.config.model_settings.get("tag_scheme", "IOB").upper()
+        return tag_scheme
 
     def encode(self, labels, **kwargs):
         """Gets a list of joint app and system IOB tags from each query's entities.
@@ -96,10 +101,10 @@ class EntityLabelEncoder(LabelEncoder):
         examples = kwargs["examples"]
         scheme = self._get_tag_scheme()
         # Here each label is a list of entities for the corresponding example
-        all_tags = []
-        for idx, label in enumerate(labels):
-            all_tags.append(get_tags_from_entities(examples[idx], label, scheme))
-        return all_tags
+        return [
+            get_tags_from_entities(example, label, scheme)
+            for example, label in zip(examples, labels)
+        ]
 
     def decode(self, tags_by_example, **kwargs):
         """Decodes the labels from the tags passed in for each query
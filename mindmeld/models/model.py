@@ -13,27 +13,39 @@
 
 """This module contains base classes for models defined in the models subpackage."""
 
+import atexit
 import copy
 import json
 import logging
 import math
+import numbers
 import os
 import pickle
+import shutil
+import tempfile
+import threading
 from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
 from inspect import signature
 from typing import Union, Type, Dict, Any, Tuple, List, Pattern, Set
 
+import numpy as np
+import scipy.sparse as sp
 from sklearn.externals import joblib
 from sklearn.model_selection import (
     GridSearchCV,
     GroupKFold,
     GroupShuffleSplit,
     KFold,
+    RandomizedSearchCV,
     ShuffleSplit,
     StratifiedKFold,
     StratifiedShuffleSplit,
 )
+from sklearn.base import clone
+from sklearn.metrics.scorer import check_scoring
 from sklearn.preprocessing import LabelEncoder as SKLabelEncoder
+from sklearn.utils import safe_indexing
 
 from ._util import _is_module_available
 from .evaluation import EntityModelEvaluation, StandardModelEvaluation
@@ -62,6 +74,9 @@ from ..text_preparation.text_preparation_pipeline import (
 # for backwards compatability for sklearn models serialized and dumped in previous version
 from .labels import LabelEncoder, EntityLabelEncoder  # pylint: disable=unused-import
 
+if _is_module_available("optuna"):
+    import optuna
+
 logger = logging.getLogger(__name__)
 
 Examples = Union[PQL.QueryIterator, PQL.ListIterator]
@@ -78,7 +93,21 @@ class ModelConfig:
             `fit()` and `predict()`. Used to select feature extractors
         label_type (str): The type of the labels which will be passed into
             `fit()` and returned by `predict()`. Used to select the label encoder
-        model_settings (dict): Settings specific to the model type specified
+        model_settings (dict): Settings specific to the model type specified. Text models
+            also accept
+            {'feature_vectorizer': 'dict',
+            'hash_bits': 20,
+            'cv_backend': 'multiprocessing',
+            'cache_dir': None,
+            'feature_extraction_n_jobs': 1,
+            'random_state': None
+            }
+            where 'feature_vectorizer' is either 'dict' or 'hasher', 'hash_bits' sets the
+            size of the hashed feature space, 'cv_backend' is the joblib backend of the
+            hyperparameter search ('threading' by default for logreg and svm),
+            'cache_dir' caches fitted preprocessors on disk, 'feature_extraction_n_jobs' is
+            the number of feature extraction threads and 'random_state' seeds the training
+            data shuffle
         params (dict): Params to pass to the underlying classifier
         param_selection (dict): Configuration for param selection (using cross
             validation)
@@ -87,7 +116,13 @@ class ModelConfig:
             'k': 10,
             'n_jobs': 2,
             'scoring': '',
-            'grid': {}
+            'grid': {},
+            'search_type': 'grid',
+            'n_iter': 10,
+            'n_trials': 50,
+            'early_stopping_rounds': None,
+            'random_state': None,
+            'temp_folder': None
             }
         features (dict): The keys are the names of feature extractors and the
             values are either a kwargs dict which will be passed into the
@@ -405,6 +440,329 @@ class AbstractModel(ABC):
         pass
 
 
+@contextmanager
+def _parallel_search_backend(backend, n_jobs):
+    """Runs the enclosed hyperparameter search on the given joblib backend.
+
+    With the 'threading' backend the workers share the training data, which suits
+    estimators that release the GIL while fitting. With the process based 'multiprocessing'
+    backend, large feature matrices are memory mapped beforehand (see `_memory_mapped`) so
+    that the worker processes are passed a reference to the file rather than a pickle.
+
+    Args:
+        backend (str): The name of the joblib backend
+        n_jobs (int): The number of workers
+    """
+    with joblib.parallel_backend(backend, n_jobs=n_jobs):
+        yield
+
+
+def _get_nbytes(X):
+    """Returns the number of bytes backing a dense or sparse matrix, or None for other data"""
+    if sp.issparse(X) and hasattr(X, "indptr"):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    if isinstance(X, np.ndarray):
+        return X.nbytes
+    return None
+
+
+def _get_memmap_folder(temp_folder=None):
+    """Returns the folder to memory map matrices from, chosen the same way as joblib: the given
+    folder, then the JOBLIB_TEMP_FOLDER environment variable, then the /dev/shm RAM disk when
+    available, then the system temporary folder.
+
+    Args:
+        temp_folder (str, optional): The folder set in the param selection settings
+    """
+    if temp_folder:
+        return temp_folder
+    temp_folder = os.environ.get("JOBLIB_TEMP_FOLDER")
+    if temp_folder:
+        return temp_folder
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+@contextmanager
+def _memory_mapped(X, temp_folder=None):
+    """Dumps a dense or sparse matrix to a temporary folder and yields it memory mapped read
+    only. Worker processes are then passed a reference to the file instead of a pickle of the
+    matrix, which joblib would otherwise hash and dump again for every dispatched task. The
+    folder is removed on exit.
+
+    Args:
+        X: The matrix to memory map
+        temp_folder (str, optional): The folder to create the temporary folder in, see \
+            `_get_memmap_folder`
+    """
+    folder = tempfile.mkdtemp(prefix="mindmeld_cv_", dir=_get_memmap_folder(temp_folder))
+    try:
+        path = os.path.join(folder, "X.pkl")
+        joblib.dump(X, path)
+        yield joblib.load(path, mmap_mode="r")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def _extract_features_chunk(extract_features, examples, workspace_resource):
+    """Extracts the features of a chunk of examples on a feature extraction worker. This is a
+    module level function so that joblib only has to check that it, rather than the model
+    holding the feature extractors, can be pickled.
+
+    Args:
+        extract_features (callable): Extracts the feature dict of a single example
+        examples (list): The chunk of examples
+        workspace_resource (dict): The resources of the feature extractors
+
+    Returns:
+        list: The feature dicts of the examples, in order
+    """
+    return [extract_features(example, workspace_resource) for example in examples]
+
+
+# threading Parallel instances shared by all models for feature extraction, keyed by n_jobs
+_FEATURE_EXTRACTION_POOLS = {}
+_FEATURE_EXTRACTION_POOLS_LOCK = threading.Lock()
+
+
+def _get_feature_extraction_parallel(n_jobs):
+    """Returns the joblib threading Parallel which extracts features with the given number of
+    threads, along with the lock guarding its use. A single pool is started per number of
+    threads and shared by every model in the process, so its workers are kept alive between
+    extractions without each classifier holding idle threads of its own. The pools are shut
+    down by `_close_feature_extraction_pools`.
+
+    Args:
+        n_jobs (int): The number of worker threads
+
+    Returns:
+        (tuple): The Parallel instance and its lock
+    """
+    with _FEATURE_EXTRACTION_POOLS_LOCK:
+        pool = _FEATURE_EXTRACTION_POOLS.get(n_jobs)
+        if pool is None:
+            parallel = joblib.Parallel(n_jobs=n_jobs, backend="threading")
+            # entering the Parallel keeps its workers alive between calls
+            parallel.__enter__()
+            pool = (parallel, threading.Lock())
+            _FEATURE_EXTRACTION_POOLS[n_jobs] = pool
+        return pool
+
+
+def _close_feature_extraction_pools():
+    """Shuts down the worker threads of the shared feature extraction pools. This runs at
+    exit, and pools are started again by the next multi-threaded extraction.
+    """
+    with _FEATURE_EXTRACTION_POOLS_LOCK:
+        pools = list(_FEATURE_EXTRACTION_POOLS.values())
+        _FEATURE_EXTRACTION_POOLS.clear()
+    for parallel, lock in pools:
+        # wait for an extraction still running on the pool
+        with lock:
+            parallel.__exit__(None, None, None)
+
+
+atexit.register(_close_feature_extraction_pools)
+
+
+class _OptunaSearchCV:  # pylint: disable=too-many-instance-attributes
+    """A hyperparameter search which samples candidates from the grid with Optuna's TPE
+    sampler for a fixed budget of trials instead of fitting every combination. The folds of a
+    trial are fit one after another so that a median pruner can stop candidates scoring below
+    earlier trials part way through cross-validation. Once fit, it exposes the same results as
+    GridSearchCV with refit=False, with cv_results_ covering the trials which were not pruned.
+
+    Attributes:
+        estimator: The estimator whose hyperparameters are being selected
+        param_grid (dict): lists of parameter values, keyed by parameter name
+        scoring: The scorer to use when evaluating candidates
+        cv: The cross-validation splitter
+        n_trials (int): The maximum number of candidates to evaluate
+        n_jobs (int): The number of trials to run in parallel threads
+        random_state (int): The seed of the TPE sampler
+        early_stopping_rounds (int): The number of trials without a better score after which
+            the search is stopped, or None to run every trial
+    """
+
+    def __init__(
+        self,
+        estimator,
+        param_grid,
+        scoring,
+        cv,
+        n_trials,
+        n_jobs=1,
+        random_state=None,
+        early_stopping_rounds=None,
+    ):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.n_trials = n_trials
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.early_stopping_rounds = early_stopping_rounds
+
+    def _stop_early(self, study, trial):
+        """Optuna callback stopping the study once the best trial is early_stopping_rounds
+        trials old.
+        """
+        try:
+            best_trial = study.best_trial
+        except ValueError:
+            # no trial has been completed yet
+            return
+        if trial.number - best_trial.number >= self.early_stopping_rounds:
+            logger.info(
+                "Stopping hyperparameter search, no improvement in the last %s trials",
+                self.early_stopping_rounds,
+            )
+            study.stop()
+
+    def fit(self, X, y=None, groups=None):
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        splits = list(self.cv.split(X, y, groups))
+        results = []
+
+        def objective(trial):
+            # trials pick the index of a value, as optuna only stores primitive categories
+            params = {
+                name: values[trial.suggest_categorical(name, list(range(len(values))))]
+                for name, values in self.param_grid.items()
+            }
+            scores = []
+            for step, (train, test) in enumerate(splits):
+                estimator = clone(self.estimator).set_params(**params)
+                estimator.fit(safe_indexing(X, train), safe_indexing(y, train))
+                scores.append(
+                    scorer(estimator, safe_indexing(X, test), safe_indexing(y, test))
+                )
+                trial.report(np.mean(scores), step)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+            mean_score = np.mean(scores)
+            results.append((params, mean_score, np.std(scores)))
+            return mean_score
+
+        study = optuna.create_study(
+            direction="maximize",
+            sampler=optuna.samplers.TPESampler(seed=self.random_state),
+            pruner=optuna.pruners.MedianPruner(),
+        )
+        callbacks = [self._stop_early] if self.early_stopping_rounds else None
+        study.optimize(
+            objective, n_trials=self.n_trials, n_jobs=self.n_jobs, callbacks=callbacks
+        )
+
+        if not results:
+            raise ValueError("No hyperparameter search trial was completed")
+        self.cv_results_ = {
+            "params": [params for params, _, _ in results],
+            "mean_test_score": np.array([mean for _, mean, _ in results]),
+            "std_test_score": np.array([std for _, _, std in results]),
+        }
+        best_index = int(np.argmax(self.cv_results_["mean_test_score"]))
+        self.best_params_ = self.cv_results_["params"][best_index]
+        self.best_score_ = self.cv_results_["mean_test_score"][best_index]
+        self.n_splits_ = len(splits)
+        return self
+
+
+# the parameter a warm started ensemble is grown along, one size after another. Linear models
+# aren't searched along a path, as the pinned scikit-learn fits logistic regression with
+# liblinear, which ignores warm_start.
+_WARM_START_PATH_PARAM = "n_estimators"
+
+
+def _fit_warm_start_path(estimator, X, y, train, test, param_name, param_values, scorer):
+    """Fits a warm started estimator on a training fold for each value of a parameter in turn,
+    so that every fit starts from the solution of the previous one.
+
+    Returns:
+        list: The score on the test fold after each fit
+    """
+    estimator = clone(estimator)
+    X_train, y_train = safe_indexing(X, train), safe_indexing(y, train)
+    X_test, y_test = safe_indexing(X, test), safe_indexing(y, test)
+    scores = []
+    for value in param_values:
+        estimator.set_params(**{param_name: value})
+        estimator.fit(X_train, y_train)
+        scores.append(scorer(estimator, X_test, y_test))
+    return scores
+
+
+class _WarmStartPathSearchCV:
+    """A grid search over the size of a warm started ensemble. Rather than fitting every
+    candidate independently, each fold grows one ensemble through the candidate sizes in
+    increasing order, adding estimators to the previous fit. Once fit, it exposes the same
+    results as GridSearchCV with refit=False, with the candidates in path order.
+
+    Attributes:
+        estimator: The ensemble whose size is being selected, with warm_start set
+        param_name (str): The name of the parameter being searched
+        param_values (list): The candidate values, in increasing order
+        scoring: The scorer to use when evaluating candidates
+        cv: The cross-validation splitter
+        n_jobs (int): The number of folds to fit in parallel
+    """
+
+    def __init__(self, estimator, param_name, param_values, scoring, cv, n_jobs=1):
+        self.estimator = estimator
+        self.param_name = param_name
+        self.param_values = param_values
+        self.scoring = scoring
+        self.cv = cv
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None, groups=None):
+        scorer = check_scoring(self.estimator, scoring=self.scoring)
+        splits = list(self.cv.split(X, y, groups))
+        fold_scores = np.array(
+            joblib.Parallel(n_jobs=self.n_jobs, pre_dispatch="2*n_jobs")(
+                joblib.delayed(_fit_warm_start_path)(
+                    self.estimator,
+                    X,
+                    y,
+                    train,
+                    test,
+                    self.param_name,
+                    self.param_values,
+                    scorer,
+                )
+                for train, test in splits
+            )
+        )
+        self.cv_results_ = {
+            "params": [{self.param_name: value} for value in self.param_values],
+            "mean_test_score": fold_scores.mean(axis=0),
+            "std_test_score": fold_scores.std(axis=0),
+        }
+        best_index = int(np.argmax(self.cv_results_["mean_test_score"]))
+        self.best_params_ = self.cv_results_["params"][best_index]
+        self.best_score_ = self.cv_results_["mean_test_score"][best_index]
+        self.n_splits_ = len(splits)
+        return self
+
+    @staticmethod
+    def get_path_param(estimator, param_grid):
+        """Returns the name of the parameter the grid can be searched along with warm starts,
+        or None when the grid needs a full search.
+        """
+        if not estimator.get_params().get("warm_start") or len(param_grid) != 1:
+            return None
+        param_name, values = next(iter(param_grid.items()))
+        if param_name != _WARM_START_PATH_PARAM or hasattr(values, "rvs"):
+            return None
+        if not all(
+            isinstance(value, numbers.Real) and not isinstance(value, bool) for value in values
+        ):
+            return None
+        return param_name
+
+
 class Model(AbstractModel):
     """An abstract class upon which all models are based.
 
@@ -414,6 +772,20 @@ class Model(AbstractModel):
 
     # model scoring type
     LIKELIHOOD_SCORING = "log_loss"
+
+    # hyperparameter search types
+    GRID_SEARCH_TYPE = "grid"
+    RANDOM_SEARCH_TYPE = "random"
+    TPE_SEARCH_TYPE = "tpe"
+    DEFAULT_RANDOM_SEARCH_ITERATIONS = 10
+    DEFAULT_TPE_SEARCH_TRIALS = 50
+
+    # joblib backends for hyperparameter search
+    THREADING_CV_BACKEND = "threading"
+    MULTIPROCESSING_CV_BACKEND = "multiprocessing"
+    # feature matrices from this size are memory mapped for process based search
+    MEMMAP_MIN_NBYTES = 1e6
+
     ALLOWED_CLASSIFIER_TYPES: List[str] = NotImplemented
 
     def __init__(self, config):
@@ -421,6 +793,8 @@ class Model(AbstractModel):
         self._label_encoder = get_label_encoder(self.config)
         self._current_params = None
         self._clf = None
+        self._compiled_extractors = None
+        self._feature_requirements = None
         self.cv_loss_ = None
 
     def _fit(self, examples, labels, params=None):
@@ -466,31 +840,37 @@ class Model(AbstractModel):
         estimator, param_grid = self._get_cv_estimator_and_params(
             model_class, param_grid
         )
-        # set GridSearchCV's return_train_score attribute to False improves cross-validation
-        # runtime perf as it doesn't have to compute training scores and which we don't consume
-        grid_cv = GridSearchCV(
-            estimator=estimator,
-            scoring=scoring,
-            param_grid=param_grid,
-            cv=cv_iterator,
-            n_jobs=n_jobs,
-            return_train_score=False,
+        search_cv = self._get_param_search(
+            estimator, param_grid, cv_iterator, scoring, n_jobs, selection_settings
         )
-        model = grid_cv.fit(examples, labels, groups)
-
-        for idx, params in enumerate(model.cv_results_["params"]):
-            logger.debug("Candidate parameters: %s", params)
-            std_err = (
-                2.0
-                * model.cv_results_["std_test_score"][idx]
-                / math.sqrt(model.n_splits_)
-            )
+        cv_backend = self._get_cv_backend()
+        temp_folder = selection_settings.get("temp_folder")
+        with ExitStack() as stack:
+            search_examples = examples
+            nbytes = _get_nbytes(examples)
+            # optuna runs its trials on threads of its own, which share the matrix anyway
+            if (
+                cv_backend == Model.MULTIPROCESSING_CV_BACKEND
+                and not isinstance(search_cv, _OptunaSearchCV)
+                and n_jobs != 1
+                and nbytes is not None
+                and nbytes >= Model.MEMMAP_MIN_NBYTES
+            ):
+                search_examples = stack.enter_context(_memory_mapped(examples, temp_folder))
+            stack.enter_context(_parallel_search_backend(cv_backend, n_jobs))
+            model = search_cv.fit(search_examples, labels, groups)
+
+        if logger.isEnabledFor(logging.DEBUG):
             if scoring == Model.LIKELIHOOD_SCORING:
                 msg = "Candidate average log likelihood: {:.4} ± {:.4}"
             else:
                 msg = "Candidate average accuracy: {:.2%} ± {:.2%}"
-            # pylint: disable=logging-format-interpolation
-            logger.debug(msg.format(model.cv_results_["mean_test_score"][idx], std_err))
+            std_err_scale = 2.0 / math.sqrt(model.n_splits_)
+            for idx, params in enumerate(model.cv_results_["params"]):
+                logger.debug("Candidate parameters: %s", params)
+                std_err = std_err_scale * model.cv_results_["std_test_score"][idx]
+                # pylint: disable=logging-format-interpolation
+                logger.debug(msg.format(model.cv_results_["mean_test_score"][idx], std_err))
 
         if scoring == Model.LIKELIHOOD_SCORING:
             msg = "Best log likelihood: {:.4}, params: {}"
@@ -503,7 +883,18 @@ class Model(AbstractModel):
         # pylint: disable=logging-format-interpolation
         logger.info(msg.format(model.best_score_, best_params))
 
-        return model.best_estimator_, model.best_params_
+        # the searches don't refit, the best candidate is fit here on the original examples
+        # rather than on the read-only memory map the workers shared
+        best_estimator = clone(estimator).set_params(**model.best_params_)
+        best_estimator.fit(examples, labels)
+        return best_estimator, model.best_params_
+
+    def _get_cv_backend(self):
+        """Returns the joblib backend the hyperparameter search runs its fits on, set by the
+        'cv_backend' model setting and defaulting to worker processes.
+        """
+        model_settings = self.config.model_settings or {}
+        return model_settings.get("cv_backend", Model.MULTIPROCESSING_CV_BACKEND)
 
     def _get_cv_scorer(self, selection_settings):
         """
@@ -511,6 +902,87 @@ class Model(AbstractModel):
         """
         raise NotImplementedError
 
+    @staticmethod
+    def _get_param_search(
+        estimator, param_grid, cv_iterator, scoring, n_jobs, selection_settings
+    ):
+        """Returns the hyperparameter search object to use based on the selection settings.
+        Candidates are evaluated in parallel across parameter settings and folds.
+
+        Args:
+            estimator: The estimator whose hyperparameters are being selected
+            param_grid (dict): lists of parameter values, keyed by parameter name
+            cv_iterator: The cross-validation splitter
+            scoring: The scorer to use when evaluating candidates
+            n_jobs (int): The number of jobs to run in parallel
+            selection_settings (dict): A dictionary containing the cross validation \
+                selection settings
+
+        Returns:
+            (GridSearchCV, RandomizedSearchCV, _WarmStartPathSearchCV or _OptunaSearchCV): \
+                the unfitted search object, which does not refit the best candidate
+        """
+        search_type = selection_settings.get("search_type", Model.GRID_SEARCH_TYPE)
+        grid_size = None
+        if not any(hasattr(values, "rvs") for values in param_grid.values()):
+            grid_size = 1
+            for values in param_grid.values():
+                grid_size *= len(values)
+        # set return_train_score to False improves cross-validation runtime perf as it doesn't
+        # have to compute training scores and which we don't consume
+        search_kwargs = {
+            "estimator": estimator,
+            "scoring": scoring,
+            "cv": cv_iterator,
+            "n_jobs": n_jobs,
+            "pre_dispatch": "2*n_jobs",
+            "return_train_score": False,
+            # the best candidate is refit by the caller, outside of the search backend
+            "refit": False,
+        }
+        if search_type == Model.GRID_SEARCH_TYPE:
+            path_param = _WarmStartPathSearchCV.get_path_param(estimator, param_grid)
+            if path_param is not None:
+                param_values = sorted(param_grid[path_param])
+                return _WarmStartPathSearchCV(
+                    estimator, path_param, param_values, scoring, cv_iterator, n_jobs
+                )
+            return GridSearchCV(param_grid=param_grid, **search_kwargs)
+        if search_type == Model.RANDOM_SEARCH_TYPE:
+            # grid values can either be lists of candidate values or scipy.stats
+            # distributions (eg. scipy.stats.expon) to sample candidate values from
+            n_iter = selection_settings.get(
+                "n_iter", Model.DEFAULT_RANDOM_SEARCH_ITERATIONS
+            )
+            if grid_size is not None:
+                # sampling without replacement can't draw more candidates than the grid has
+                n_iter = min(n_iter, grid_size)
+            return RandomizedSearchCV(
+                param_distributions=param_grid,
+                n_iter=n_iter,
+                random_state=selection_settings.get("random_state"),
+                **search_kwargs
+            )
+        if search_type == Model.TPE_SEARCH_TYPE:
+            if not _is_module_available("optuna"):
+                raise ImportError(
+                    "Library not found: 'optuna'. Run 'pip install mindmeld[optuna]' to install."
+                )
+            if grid_size is None:
+                raise ValueError("TPE search needs lists of candidate values in its grid")
+            n_trials = selection_settings.get("n_trials", Model.DEFAULT_TPE_SEARCH_TRIALS)
+            return _OptunaSearchCV(
+                estimator,
+                param_grid,
+                scoring,
+                cv_iterator,
+                n_trials=min(n_trials, grid_size),
+                n_jobs=n_jobs,
+                random_state=selection_settings.get("random_state"),
+                early_stopping_rounds=selection_settings.get("early_stopping_rounds"),
+            )
+        raise ValueError("Unknown param search type: {!r}".format(search_type))
+
     @staticmethod
     def _clean_params(model_class, params):
         """
@@ -593,7 +1065,7 @@ class Model(AbstractModel):
         """
         self._resources.update(kwargs)
 
-    def get_feature_matrix(self, examples, y=None, fit=False):
+    def get_feature_matrix(self, examples, y=None, fit=False, return_groups=True):
         raise NotImplementedError
 
     def _extract_features(self, example, dynamic_resource=None, text_preparation_pipeline=None):
@@ -607,41 +1079,103 @@ class Model(AbstractModel):
         Returns:
             (dict of str: number): A dict of feature names to their values.
         """
-        example_type = self.config.example_type
-        feat_set = {}
         workspace_resource = ingest_dynamic_gazetteer(
             self._resources, dynamic_resource, text_preparation_pipeline
         )
-        workspace_features = copy.deepcopy(self.config.features)
-        enable_stemming = workspace_features.pop(ENABLE_STEMMING, False)
+        return self._extract_example_features(example, workspace_resource)
 
-        for name, kwargs in workspace_features.items():
-            if callable(kwargs):
-                # a feature extractor function was passed in directly
-                feat_extractor = kwargs
-            else:
-                kwargs[ENABLE_STEMMING] = enable_stemming
-                feat_extractor = get_feature_extractor(example_type, name)(**kwargs)
+    def _extract_features_batch(
+        self, examples, dynamic_resource=None, text_preparation_pipeline=None, n_jobs=1
+    ):
+        """Gets all features from each of the examples. The dynamic resource is ingested once
+        for the whole batch instead of once per example.
+
+        Args:
+            examples (list): A list of example objects.
+            dynamic_resource (dict, optional): A dynamic resource to aid NLP inference
+            text_preparation_pipeline (TextPreparationPipeline): MindMeld text processing object
+            n_jobs (int, optional): The number of threads extracting features. With more than \
+                one, the examples are split across joblib threading workers which share the \
+                model's resources.
+
+        Returns:
+            (iterable of dict of str: number): The feature dicts of the examples, in order. \
+                They are generated lazily when extracted on a single thread.
+        """
+        workspace_resource = ingest_dynamic_gazetteer(
+            self._resources, dynamic_resource, text_preparation_pipeline
+        )
+        if n_jobs == 1:
+            return (
+                self._extract_example_features(example, workspace_resource)
+                for example in examples
+            )
+        # resolve the extractors before the workers need them
+        self._get_compiled_extractors()
+        examples = list(examples)
+        # a few chunks per thread keep the workers balanced without a task per example
+        num_chunks = 4 * (n_jobs if n_jobs > 0 else joblib.cpu_count())
+        chunk_size = max(1, -(-len(examples) // num_chunks))
+        tasks = (
+            joblib.delayed(_extract_features_chunk)(
+                self._extract_example_features,
+                examples[start:start + chunk_size],
+                workspace_resource,
+            )
+            for start in range(0, len(examples), chunk_size)
+        )
+        parallel, lock = _get_feature_extraction_parallel(n_jobs)
+        if lock.acquire(blocking=False):
+            try:
+                chunks = parallel(tasks)
+            finally:
+                lock.release()
+        else:
+            # another model is extracting on the shared pool, rather than waiting for it the
+            # batch gets workers of its own
+            chunks = joblib.Parallel(n_jobs=n_jobs, backend="threading")(tasks)
+        return [feat_set for chunk in chunks for feat_set in chunk]
+
+    def _extract_example_features(self, example, workspace_resource):
+        feat_set = {}
+        for _, feat_extractor in self._get_compiled_extractors():
             feat_set.update(feat_extractor(example, workspace_resource))
         return feat_set
 
+    def _get_compiled_extractors(self):
+        """Resolves the feature extractors in the model config to their callables. This is done
+        once per model so the same extractors are reused across examples.
+
+        Returns:
+            (list of tuple): A list of feature names and their feature extractors
+        """
+        # models dumped by previous versions do not have this attribute
+        compiled_extractors = getattr(self, "_compiled_extractors", None)
+        if compiled_extractors is None:
+            example_type = self.config.example_type
+            workspace_features = copy.deepcopy(self.config.features)
+            enable_stemming = workspace_features.pop(ENABLE_STEMMING, False)
+
+            compiled_extractors = []
+            for name, kwargs in workspace_features.items():
+                if callable(kwargs):
+                    # a feature extractor function was passed in directly
+                    feat_extractor = kwargs
+                else:
+                    kwargs[ENABLE_STEMMING] = enable_stemming
+                    feat_extractor = get_feature_extractor(example_type, name)(**kwargs)
+                compiled_extractors.append((name, feat_extractor))
+            self._compiled_extractors = compiled_extractors
+        return compiled_extractors
+
     def _get_cv_iterator(self, settings):
         if not settings:
             return None
         cv_type = settings["type"]
-        try:
-            cv_iterator = {
-                "k-fold": self._k_fold_iterator,
-                "shuffle": self._shuffle_iterator,
-                "group-k-fold": self._groups_k_fold_iterator,
-                "group-shuffle": self._groups_shuffle_iterator,
-                "stratified-k-fold": self._stratified_k_fold_iterator,
-                "stratified-shuffle": self._stratified_shuffle_iterator,
-            }.get(cv_type)(settings)
-        except KeyError as e:
-            raise ValueError("Unknown param selection type: {!r}".format(cv_type)) from e
-
-        return cv_iterator
+        get_cv_iterator = _CV_ITERATORS.get(cv_type)
+        if get_cv_iterator is None:
+            raise ValueError("Unknown param selection type: {!r}".format(cv_type))
+        return get_cv_iterator(settings)
 
     @staticmethod
     def _k_fold_iterator(settings):
@@ -653,7 +1187,9 @@ class Model(AbstractModel):
         k = settings["k"]
         n = settings.get("n", k)
         test_size = 1.0 / k
-        return ShuffleSplit(n_splits=n, test_size=test_size)
+        return ShuffleSplit(
+            n_splits=n, test_size=test_size, random_state=settings.get("random_state")
+        )
 
     @staticmethod
     def _groups_k_fold_iterator(settings):
@@ -665,7 +1201,9 @@ class Model(AbstractModel):
         k = settings["k"]
         n = settings.get("n", k)
         test_size = 1.0 / k
-        return GroupShuffleSplit(n_splits=n, test_size=test_size)
+        return GroupShuffleSplit(
+            n_splits=n, test_size=test_size, random_state=settings.get("random_state")
+        )
 
     @staticmethod
     def _stratified_k_fold_iterator(settings):
@@ -677,22 +1215,25 @@ class Model(AbstractModel):
         k = settings["k"]
         n = settings.get("n", k)
         test_size = 1.0 / k
-        return StratifiedShuffleSplit(n_splits=n, test_size=test_size)
+        return StratifiedShuffleSplit(
+            n_splits=n, test_size=test_size, random_state=settings.get("random_state")
+        )
 
     def requires_resource(self, resource):
-        example_type = self.config.example_type
-        for name, kwargs in self.config.features.items():
-            if callable(kwargs):
-                # a feature extractor function was passed in directly
-                feature_extractor = kwargs
-            else:
-                feature_extractor = get_feature_extractor(example_type, name)
-            if (
-                "requirements" in feature_extractor.__dict__
-                and resource in feature_extractor.requirements
-            ):
-                return True
-        return False
+        # models dumped by previous versions do not have this attribute
+        feature_requirements = getattr(self, "_feature_requirements", None)
+        if feature_requirements is None:
+            example_type = self.config.example_type
+            feature_requirements = set()
+            for name, kwargs in self.config.features.items():
+                if callable(kwargs):
+                    # a feature extractor function was passed in directly
+                    feature_extractor = kwargs
+                else:
+                    feature_extractor = get_feature_extractor(example_type, name)
+                feature_requirements.update(feature_extractor.__dict__.get("requirements", []))
+            self._feature_requirements = feature_requirements
+        return resource in feature_requirements
 
     def initialize_resources(self, resource_loader, examples=None, labels=None):
         """Load the required resources for feature extractors. Each feature extractor uses \
@@ -761,6 +1302,17 @@ class Model(AbstractModel):
             )
 
 
+# maps each param selection type to the function creating its cross-validation splitter
+_CV_ITERATORS = {
+    "k-fold": Model._k_fold_iterator,
+    "shuffle": Model._shuffle_iterator,
+    "group-k-fold": Model._groups_k_fold_iterator,
+    "group-shuffle": Model._groups_shuffle_iterator,
+    "stratified-k-fold": Model._stratified_k_fold_iterator,
+    "stratified-shuffle": Model._stratified_shuffle_iterator,
+}
+
+
 class PytorchModel(AbstractModel):
     ALLOWED_CLASSIFIER_TYPES: List[str] = NotImplemented  # to be implemented in child classes
 
@@ -200,7 +200,7 @@ class TaggerModel(Model):
         self._label_encoder = None
         self._no_entities = None
 
-    def get_feature_matrix(self, examples, y=None, fit=False):
+    def get_feature_matrix(self, examples, y=None, fit=False, return_groups=True):
         raise NotImplementedError
 
     def select_params(self, examples, labels, selection_settings=None):
@@ -21,9 +21,10 @@ import os
 import random
 
 import numpy as np
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.externals import joblib
-from sklearn.feature_extraction import DictVectorizer
+from sklearn.feature_extraction import DictVectorizer, FeatureHasher
 from sklearn.feature_selection import SelectFromModel, SelectPercentile
 from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import LabelEncoder as SKLabelEncoder
@@ -45,6 +46,41 @@ from ..resource_loader import ProcessedQueryList as PQL
 logger = logging.getLogger(__name__)
 
 
+# feature scaler constructors, keyed by the feature_scaler model setting
+_SCALER_FACTORIES = {
+    "std-dev": lambda: StandardScaler(with_mean=False),
+    # CSR feature matrices are scaled in place rather than copied
+    "max-abs": lambda: MaxAbsScaler(copy=False),
+}
+
+
+def _fit_preprocessors(class_encoder, vectorizer, scaler, selector, feats, y):
+    """Fits the label encoder and feature preprocessors of a text model on its training data.
+    This is a module level function so that its results can be cached with joblib.Memory.
+
+    Args:
+        class_encoder (LabelEncoder): The encoder of the class labels
+        vectorizer: The vectorizer of the feature dicts
+        scaler: The feature scaler, or None
+        selector: The feature selector, or None
+        feats (list): The feature dicts of the training examples
+        y (list): The class labels of the training examples
+
+    Returns:
+        (tuple): The fitted class encoder, vectorizer, scaler and selector, followed by the \
+            training feature matrix and encoded labels
+    """
+    y = class_encoder.fit_transform(y)
+    X = vectorizer.fit_transform(feats)
+    if scaler is not None:
+        X = scaler.fit_transform(X)
+    if selector is not None:
+        # the selectors take the CSR matrix as is, both f_classif and the liblinear fit of
+        # the l1 selector work on rows and would convert a CSC matrix straight back
+        X = selector.fit_transform(X, y)
+    return class_encoder, vectorizer, scaler, selector, X, y
+
+
 class TextModel(Model):
     # classifier types
     LOG_REG_TYPE = "logreg"
@@ -52,16 +88,25 @@ class TextModel(Model):
     RANDOM_FOREST_TYPE = "rforest"
     SVM_TYPE = "svm"
     ALLOWED_CLASSIFIER_TYPES = [LOG_REG_TYPE, DECISION_TREE_TYPE, RANDOM_FOREST_TYPE, SVM_TYPE]
+    # classifiers fit by liblinear and libsvm, which release the GIL
+    _NOGIL_CLASSIFIER_TYPES = [LOG_REG_TYPE, SVM_TYPE]
 
     # default model scoring type
     ACCURACY_SCORING = "accuracy"
 
     _NEG_INF = -1e10
 
+    # feature vectorizer types
+    DICT_VECTORIZER_TYPE = "dict"
+    HASHER_VECTORIZER_TYPE = "hasher"
+
+    # default number of bits used to size the hashed feature space
+    DEFAULT_HASH_BITS = 20
+
     def __init__(self, config):
         super().__init__(config)
         self._class_encoder = SKLabelEncoder()
-        self._feat_vectorizer = DictVectorizer()
+        self._feat_vectorizer = self._get_feature_vectorizer()
         self._feat_selector = self._get_feature_selector()
         self._feat_scaler = self._get_feature_scaler()
         self._meta_type = None
@@ -70,6 +115,11 @@ class TextModel(Model):
         self.cv_loss_ = None
         self.train_acc_ = None
 
+    @property
+    def _class_labels(self):
+        """numpy.ndarray: The class label of each encoded class, in encoded order"""
+        return self._class_encoder.classes_
+
     def __getstate__(self):
         """Returns the information needed pickle an instance of this class.
 
@@ -86,6 +136,9 @@ class TextModel(Model):
                 CHAR_NGRAM_FREQ_RSC,
             ]
         }
+        # compiled feature extractors are closures which can't be pickled, they are
+        # resolved again from the config on first use
+        attributes["_compiled_extractors"] = None
         return attributes
 
     def _get_model_constructor(self):
@@ -102,6 +155,17 @@ class TextModel(Model):
             msg = "{}: Classifier type {!r} not recognized"
             raise ValueError(msg.format(self.__class__.__name__, classifier_type)) from e
 
+    def _get_cv_backend(self):
+        """Returns the joblib backend for hyperparameter search. Classifiers which release the
+        GIL are searched on threads that share the feature matrix, others on worker processes.
+        """
+        model_settings = self.config.model_settings or {}
+        if "cv_backend" in model_settings:
+            return model_settings["cv_backend"]
+        if model_settings.get("classifier_type") in self._NOGIL_CLASSIFIER_TYPES:
+            return TextModel.THREADING_CV_BACKEND
+        return TextModel.MULTIPROCESSING_CV_BACKEND
+
     def _get_cv_scorer(self, selection_settings):
         """
         Returns the scorer to use based on the selection settings and classifier type,
@@ -130,17 +194,17 @@ class TextModel(Model):
         params = self._clean_params(model_class, params)
         return model_class(**params).fit(examples, labels)
 
-    def predict_log_proba(self, examples, dynamic_resource=None):
-        X, _, _ = self.get_feature_matrix(examples, dynamic_resource=dynamic_resource)
-        predictions = self._predict_proba(X, self._clf.predict_log_proba)
+    def predict_log_proba(self, examples, dynamic_resource=None, top_k=None):
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1, got {!r}".format(top_k))
+        X, _, _ = self.get_feature_matrix(
+            examples, dynamic_resource=dynamic_resource, return_groups=False
+        )
+        log_probas = self._clf.predict_log_proba(X)
 
         # JSON can't reliably encode infinity, so replace it with large number
-        for row in predictions:
-            _, probas = row
-            for label, proba in probas.items():
-                if proba == -np.Infinity:
-                    probas[label] = TextModel._NEG_INF
-        return predictions
+        np.copyto(log_probas, TextModel._NEG_INF, where=np.isneginf(log_probas))
+        return self._decode_probas(log_probas, top_k=top_k)
 
     def _get_feature_weight(self, feat_name, label_class):
         """Retrieves the feature weight from the coefficient matrix. If there are only two
@@ -182,18 +246,26 @@ class TextModel(Model):
             )
             return []
 
+        if not hasattr(self._feat_vectorizer, "vocabulary_"):
+            logging.warning(
+                "Currently inspection is not available for models using hashed features"
+            )
+            return []
+
         try:
             gold_class = self._class_encoder.transform([gold_label])
         except ValueError:
             logger.warning("Unable to decode label `%s`", gold_label)
             gold_class = None
 
-        pred_label = self.predict([example], dynamic_resource=dynamic_resource)[0]
-        pred_class = self._class_encoder.transform([pred_label])
+        # the features are extracted once and used both to predict and to build the table
         features = self._extract_features(
             example, dynamic_resource=dynamic_resource,
             text_preparation_pipeline=self.text_preparation_pipeline
         )
+        X, _ = self._preprocess_data([features])
+        pred_class = self._clf.predict(X)
+        pred_label = self._label_encoder.decode(self._class_labels[pred_class])[0]
 
         logging.info("Predicted: %s.", pred_label)
 
@@ -255,40 +327,71 @@ class TextModel(Model):
 
         return inspect_table
 
-    def _predict_proba(self, X, predictor):
-        predictions = []
-        for row in predictor(X):
-            probabilities = {}
-            top_class = None
-            for class_index, proba in enumerate(row):
-                raw_class = self._class_encoder.inverse_transform([class_index])[0]
-                decoded_class = self._label_encoder.decode([raw_class])[0]
-                probabilities[decoded_class] = proba
-                if proba > probabilities.get(top_class, -1.0):
-                    top_class = decoded_class
-            predictions.append((top_class, probabilities))
+    def _predict_proba(self, X, predictor, top_k=None):
+        return self._decode_probas(predictor(X), top_k=top_k)
 
-        return predictions
+    def _decode_probas(self, probas, top_k=None):
+        """Pairs each row of a class probability matrix with its decoded top class.
+
+        Args:
+            probas (numpy.ndarray): The (log) probabilities, one column per encoded class
+            top_k (int, optional): The number of most probable classes to decode for each row. \
+                All classes are decoded when not given.
+
+        Returns:
+            list: A (top class, {class: probability}) tuple for every row
+        """
+        # every column is decoded once rather than once per row
+        decoded_classes = self._label_encoder.decode(self._class_labels)
+        if top_k is None or top_k >= probas.shape[1]:
+            top_indices = probas.argmax(axis=1)
+            return [
+                (decoded_classes[top_index], dict(zip(decoded_classes, row)))
+                for top_index, row in zip(top_indices, probas.tolist())
+            ]
+
+        # partition out the columns of the k most probable classes of each row, kept in column
+        # order like the full decoding
+        rows = np.arange(probas.shape[0])[:, np.newaxis]
+        top_columns = np.sort(np.argpartition(-probas, top_k - 1, axis=1)[:, :top_k], axis=1)
+        top_probas = probas[rows, top_columns]
+        top_indices = top_columns[rows[:, 0], top_probas.argmax(axis=1)]
+        return [
+            (
+                decoded_classes[top_index],
+                {decoded_classes[column]: proba for column, proba in zip(columns, row)},
+            )
+            for top_index, columns, row in zip(
+                top_indices, top_columns.tolist(), top_probas.tolist()
+            )
+        ]
 
-    def get_feature_matrix(self, examples, y=None, fit=False, dynamic_resource=None):
+    def get_feature_matrix(
+        self, examples, y=None, fit=False, dynamic_resource=None, return_groups=True
+    ):
         """Transforms a list of examples into a feature matrix.
 
         Args:
             examples (list): The examples.
+            return_groups (bool, optional): Whether to build the group labels, which are only \
+                needed to split the examples for cross-validation
 
         Returns:
             (tuple): tuple containing:
 
                 * (numpy.matrix): The feature matrix.
-                * (numpy.array): The group labels for examples.
+                * (numpy.array): The encoded labels.
+                * (list): The group labels for examples, or None if they weren't requested.
         """
-        groups = []
-        feats = []
-        for idx, example in enumerate(examples):
-            feats.append(
-                self._extract_features(example, dynamic_resource, self.text_preparation_pipeline)
-            )
-            groups.append(idx)
+        # unless extracted on multiple threads, feature dicts are streamed into the vectorizer
+        # so that only one of them needs to be held in memory at a time
+        feats = self._extract_features_batch(
+            examples,
+            dynamic_resource,
+            self.text_preparation_pipeline,
+            n_jobs=self.config.model_settings.get("feature_extraction_n_jobs", 1),
+        )
+        groups = list(range(len(examples))) if return_groups else None
 
         X, y = self._preprocess_data(feats, y, fit=fit)
         return X, y, groups
@@ -296,12 +399,36 @@ class TextModel(Model):
     def _preprocess_data(self, X, y=None, fit=False):
 
         if fit:
-            y = self._class_encoder.fit_transform(y)
-            X = self._feat_vectorizer.fit_transform(X)
-            if self._feat_scaler is not None:
-                X = self._feat_scaler.fit_transform(X)
-            if self._feat_selector is not None:
-                X = self._feat_selector.fit_transform(X, y)
+            preprocessors = (
+                self._class_encoder,
+                self._feat_vectorizer,
+                self._feat_scaler,
+                self._feat_selector,
+            )
+            fit_preprocessors = _fit_preprocessors
+            cache_dir = self.config.model_settings.get("cache_dir")
+            if cache_dir:
+                # the fitted preprocessors and training matrix are cached on disk, keyed on
+                # the unfitted preprocessors and the training data, so repeated builds on the
+                # same data skip vectorizing. The streamed feature dicts and the labels are
+                # materialized so that only their values, not the iterators, are hashed.
+                X = list(X)
+                y = list(y)
+                preprocessors = tuple(
+                    None if preprocessor is None else clone(preprocessor)
+                    for preprocessor in preprocessors
+                )
+                fit_preprocessors = joblib.Memory(cache_dir, verbose=0).cache(
+                    _fit_preprocessors
+                )
+            (
+                self._class_encoder,
+                self._feat_vectorizer,
+                self._feat_scaler,
+                self._feat_selector,
+                X,
+                y,
+            ) = fit_preprocessors(*preprocessors, X, y)
         else:
             X = self._feat_vectorizer.transform(X)
             if self._feat_scaler is not None:
@@ -358,6 +485,31 @@ class TextModel(Model):
 
         return param_grid
 
+    def _get_feature_vectorizer(self):
+        """Get a feature vectorizer based on the model settings. When the 'feature_vectorizer'
+        model setting is 'hasher', feature names are hashed into a fixed size feature space
+        instead of being collected into a vocabulary.
+
+        Returns:
+            (Object): a feature vectorizer which converts feature dicts to a feature matrix
+        """
+        model_settings = self.config.model_settings or {}
+        vectorizer_type = model_settings.get(
+            "feature_vectorizer", TextModel.DICT_VECTORIZER_TYPE
+        )
+        if vectorizer_type not in (
+            TextModel.DICT_VECTORIZER_TYPE,
+            TextModel.HASHER_VECTORIZER_TYPE,
+        ):
+            msg = "{}: Feature vectorizer type {!r} not recognized"
+            raise ValueError(msg.format(self.__class__.__name__, vectorizer_type))
+        if vectorizer_type == TextModel.HASHER_VECTORIZER_TYPE:
+            hash_bits = model_settings.get("hash_bits", TextModel.DEFAULT_HASH_BITS)
+            return FeatureHasher(n_features=2 ** hash_bits, input_type="dict")
+        # the vocabulary is kept in the order features are first seen, as sorting it reorders
+        # the columns of a copy of the whole training matrix
+        return DictVectorizer(sort=False)
+
     def _get_feature_selector(self):
         """Get a feature selector instance based on the feature_selector model
         parameter
@@ -382,11 +534,8 @@ class TextModel(Model):
             scale_type = None
         else:
             scale_type = self.config.model_settings.get("feature_scaler")
-        scaler = {
-            "std-dev": StandardScaler(with_mean=False),
-            "max-abs": MaxAbsScaler(),
-        }.get(scale_type)
-        return scaler
+        scaler_factory = _SCALER_FACTORIES.get(scale_type)
+        return None if scaler_factory is None else scaler_factory()
 
     def evaluate(self, examples, labels):
         """Evaluates a model against the given examples and labels
@@ -437,8 +586,12 @@ class TextModel(Model):
         skip_param_selection = params is not None or self.config.param_selection is None
 
         # Shuffle to prevent order effects
-        indices = list(range(len(labels)))
-        random.shuffle(indices)
+        random_state = (self.config.model_settings or {}).get("random_state")
+        if random_state is None:
+            # seed from the random module so shuffles stay reproducible for callers which
+            # seed it with random.seed()
+            random_state = random.getrandbits(32)
+        indices = np.random.RandomState(random_state).permutation(len(labels))
         examples.reorder(indices)
         labels.reorder(indices)
         distinct_labels = set(labels)
@@ -461,14 +614,58 @@ class TextModel(Model):
         return self
 
     def predict(self, examples, dynamic_resource=None):
-        X, _, _ = self.get_feature_matrix(examples, dynamic_resource=dynamic_resource)
+        X, _, _ = self.get_feature_matrix(
+            examples, dynamic_resource=dynamic_resource, return_groups=False
+        )
         y = self._clf.predict(X)
-        predictions = self._class_encoder.inverse_transform(y)
-        return self._label_encoder.decode(predictions)
+        return self._label_encoder.decode(self._class_labels[y])
 
-    def predict_proba(self, examples, dynamic_resource=None):
-        X, _, _ = self.get_feature_matrix(examples, dynamic_resource=dynamic_resource)
-        return self._predict_proba(X, self._clf.predict_proba)
+    def predict_proba(self, examples, dynamic_resource=None, top_k=None):
+        if top_k is not None and top_k < 1:
+            raise ValueError("top_k must be at least 1, got {!r}".format(top_k))
+        X, _, _ = self.get_feature_matrix(
+            examples, dynamic_resource=dynamic_resource, return_groups=False
+        )
+        return self._predict_proba(X, self._clf.predict_proba, top_k=top_k)
+
+    def predict_many(self, example_sets, dynamic_resource=None):
+        """Predicts the classes of several sets of examples, vectorizing and classifying all
+        of them at once.
+
+        Args:
+            example_sets (list of list): The sets of examples to predict
+            dynamic_resource (dict, optional): A dynamic resource to aid NLP inference
+
+        Returns:
+            list: The predictions for each set of examples, in order
+        """
+        examples = [example for example_set in example_sets for example in example_set]
+        if not examples:
+            return [[] for _ in example_sets]
+        predictions = self.predict(examples, dynamic_resource=dynamic_resource)
+        return self._split_example_sets(predictions, example_sets)
+
+    def predict_proba_many(self, example_sets, dynamic_resource=None):
+        """Predicts the class probabilities of several sets of examples, vectorizing and
+        classifying all of them at once.
+
+        Args:
+            example_sets (list of list): The sets of examples to predict
+            dynamic_resource (dict, optional): A dynamic resource to aid NLP inference
+
+        Returns:
+            list: The predictions for each set of examples, in order
+        """
+        examples = [example for example_set in example_sets for example in example_set]
+        if not examples:
+            return [[] for _ in example_sets]
+        predictions = self.predict_proba(examples, dynamic_resource=dynamic_resource)
+        return self._split_example_sets(predictions, example_sets)
+
+    @staticmethod
+    def _split_example_sets(predictions, example_sets):
+        offsets = np.cumsum([0] + [len(example_set) for example_set in example_sets])
+        return [predictions[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
 
     def view_extracted_features(self, example, dynamic_resource=None):
         return self._extract_features(
@@ -126,5 +126,8 @@ setup(
         "transformers": [  # huggingface-transformers
             'transformers~=4.15.0; python_version>="3.6"',
         ],
+        "optuna": [
+            "optuna>=2.0,<3.0",
+        ],
     },
 )
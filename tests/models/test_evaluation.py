@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_evaluation
+----------------------------------
+
+Tests for `evaluation` module.
+"""
+# pylint: disable=locally-disabled,redefined-outer-name
+import numpy as np
+import pytest
+from sklearn.metrics import confusion_matrix, f1_score
+
+from mindmeld.models import CLASS_LABEL_TYPE, QUERY_EXAMPLE_TYPE, ModelConfig
+from mindmeld.models.evaluation import StandardModelEvaluation
+
+TEXT_LABELS = ["greet", "exit", "help", "unused"]
+Y_TRUE = [0, 0, 1, 2, 2, 2, 1, 0, 2, 1]
+Y_PRED = [0, 1, 1, 2, 0, 2, 1, 0, 1, 1]
+
+
+@pytest.fixture
+def evaluation():
+    """A standard model evaluation without results"""
+    config = ModelConfig(
+        **{
+            "model_type": "text",
+            "example_type": QUERY_EXAMPLE_TYPE,
+            "label_type": CLASS_LABEL_TYPE,
+            "model_settings": {"classifier_type": "logreg"},
+            "params": {},
+            "features": {},
+        }
+    )
+    return StandardModelEvaluation(config, [])
+
+
+def test_common_stats_counts(evaluation):
+    """Tests the confusion matrix and counts against sklearn's confusion matrix"""
+    stats = evaluation._get_common_stats(Y_TRUE, Y_PRED, TEXT_LABELS)
+    labels = list(range(len(TEXT_LABELS)))
+    expected = confusion_matrix(Y_TRUE, Y_PRED, labels=labels)
+
+    assert np.array_equal(stats["confusion_matrix"], expected)
+
+    tp = np.diag(expected)
+    fp = expected.sum(axis=0) - tp
+    fn = expected.sum(axis=1) - tp
+    tn = len(Y_TRUE) - tp - fp - fn
+    class_stats = stats["class_stats"]
+    assert class_stats["tp"] == tp.tolist()
+    assert class_stats["fp"] == fp.tolist()
+    assert class_stats["fn"] == fn.tolist()
+    assert class_stats["tn"] == tn.tolist()
+
+    stats_overall = stats["stats_overall"]
+    assert stats_overall["tp"] == tp.sum()
+    assert stats_overall["fp"] == fp.sum()
+    assert stats_overall["fn"] == fn.sum()
+    assert stats_overall["tn"] == tn.sum()
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_common_stats_f1_scores(evaluation):
+    """Tests the overall f1 scores against sklearn's f1_score"""
+    stats_overall = evaluation._get_common_stats(Y_TRUE, Y_PRED, TEXT_LABELS)["stats_overall"]
+    labels = list(range(len(TEXT_LABELS)))
+
+    for average in ("macro", "weighted", "micro"):
+        expected = f1_score(Y_TRUE, Y_PRED, labels=labels, average=average)
+        assert stats_overall["f1_" + average] == pytest.approx(expected)
+    assert stats_overall["accuracy"] == pytest.approx(0.7)
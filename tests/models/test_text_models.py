@@ -9,11 +9,17 @@ Tests for `standard_models` module.
 """
 # pylint: disable=locally-disabled,redefined-outer-name
 import os
+import tempfile
 
 import pytest
+from sklearn.feature_extraction import DictVectorizer, FeatureHasher
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import KFold
 
 from mindmeld import markup
 from mindmeld.models import CLASS_LABEL_TYPE, QUERY_EXAMPLE_TYPE, ModelConfig
+from mindmeld.models import model as model_module
+from mindmeld.models.model import Model, _OptunaSearchCV, _WarmStartPathSearchCV
 from mindmeld.models.text_models import TextModel
 from mindmeld.resource_loader import ResourceLoader, ProcessedQueryList
 
@@ -170,3 +176,479 @@ class TestTextModel:
             markup.load_query("hi there").query
         )
         assert extracted_features == expected_features
+
+    def test_fit_predict_hashed_features(self, resource_loader):
+        """Tests prediction after a fit with hashed features"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {
+                    "classifier_type": "logreg",
+                    "feature_vectorizer": "hasher",
+                    "hash_bits": 16,
+                },
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        assert model.predict([markup.load_query("hi").query]) == "greet"
+        assert model.predict([markup.load_query("bye").query]) == "exit"
+
+    def test_fit_cv_random_search(self, resource_loader):
+        """Tests fitting with randomized param selection"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "param_selection": {
+                    "type": "k-fold",
+                    "k": 5,
+                    "search_type": "random",
+                    "n_iter": 100,
+                    "grid": {"C": [10, 100, 1000], "fit_intercept": [True, False]},
+                },
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        assert model._current_params["C"] in [10, 100, 1000]
+
+    def test_fit_predict_proba(self, resource_loader):
+        """Tests class probabilities after a fit"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        queries = [markup.load_query(text).query for text in ("hi", "bye")]
+        predictions = model.predict_proba(queries)
+        assert [top_class for top_class, _ in predictions] == ["greet", "exit"]
+        for top_class, probas in predictions:
+            assert set(probas) == set(labels)
+            assert probas[top_class] == max(probas.values())
+            assert sum(probas.values()) == pytest.approx(1.0)
+
+    def test_fit_cv_tpe_search(self, resource_loader):
+        """Tests fitting with TPE param selection"""
+        pytest.importorskip("optuna")
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "param_selection": {
+                    "type": "k-fold",
+                    "k": 5,
+                    "search_type": "tpe",
+                    "n_trials": 4,
+                    "random_state": 0,
+                    "grid": {"C": [10, 100, 1000], "fit_intercept": [True, False]},
+                },
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        assert model._current_params["C"] in [10, 100, 1000]
+
+    def test_tpe_search_early_stopping(self):
+        """Tests that the TPE search stops once the best trial stops improving"""
+        pytest.importorskip("optuna")
+        # every candidate separates the classes perfectly, so no trial beats the first one
+        X = [[-10.0], [10.0]] * 10
+        y = [0, 1] * 10
+        n_trials = 8
+        search = _OptunaSearchCV(
+            LogisticRegression(),
+            {"C": [1, 2, 5, 10, 20, 50, 100, 1000]},
+            "accuracy",
+            KFold(n_splits=2),
+            n_trials=n_trials,
+            n_jobs=1,
+            random_state=0,
+            early_stopping_rounds=1,
+        )
+        search.fit(X, y)
+
+        assert len(search.cv_results_["params"]) < n_trials
+
+    def test_get_feature_matrix_threaded_extraction(self, resource_loader):
+        """Tests that features extracted on multiple threads match serial extraction"""
+        num_chars_feature = "num_chars"
+
+        def extract_num_chars(query, resources):
+            del resources
+            return {num_chars_feature: len(query.text)}
+
+        matrices = []
+        for n_jobs in (1, 2):
+            config = ModelConfig(
+                **{
+                    "model_type": "text",
+                    "example_type": QUERY_EXAMPLE_TYPE,
+                    "label_type": CLASS_LABEL_TYPE,
+                    "model_settings": {
+                        "classifier_type": "logreg",
+                        "feature_extraction_n_jobs": n_jobs,
+                    },
+                    "params": {"fit_intercept": True, "C": 100},
+                    "features": {
+                        "bag-of-words": {"lengths": [1]},
+                        "freq": {"bins": 5},
+                        # an extractor closure, which can't be pickled
+                        "length": extract_num_chars,
+                    },
+                }
+            )
+            model = TextModel(config)
+            examples = self.labeled_data.queries()
+            labels = self.labeled_data.intents()
+            model.initialize_resources(resource_loader, examples, labels)
+            X, _, _ = model.get_feature_matrix(
+                examples, labels, fit=True, return_groups=False
+            )
+            matrices.append(X)
+
+        assert (matrices[0] != matrices[1]).nnz == 0
+
+    def test_fit_cv_memory_mapped(self, resource_loader, monkeypatch, tmpdir):
+        """Tests a process based search over a memory mapped feature matrix"""
+        created_folders = []
+        mkdtemp = tempfile.mkdtemp
+
+        def record_mkdtemp(*args, **kwargs):
+            folder = mkdtemp(*args, **kwargs)
+            created_folders.append(folder)
+            return folder
+
+        monkeypatch.setattr(Model, "MEMMAP_MIN_NBYTES", 0)
+        monkeypatch.setattr(tempfile, "mkdtemp", record_mkdtemp)
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "rforest"},
+                "param_selection": {
+                    "type": "k-fold",
+                    "k": 5,
+                    "n_jobs": 2,
+                    "grid": {"max_depth": [None, 5]},
+                    "temp_folder": str(tmpdir),
+                },
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        assert model._current_params["max_depth"] in [None, 5]
+        memmap_folders = [
+            folder for folder in created_folders
+            if os.path.basename(folder).startswith("mindmeld_cv_")
+        ]
+        assert [os.path.dirname(folder) for folder in memmap_folders] == [str(tmpdir)]
+        assert os.listdir(str(tmpdir)) == []
+
+    def test_feature_extraction_pool_reuse(self, resource_loader):
+        """Tests that threaded extractions share one pool, which is released on shutdown"""
+        model_module._close_feature_extraction_pools()
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {
+                    "classifier_type": "logreg",
+                    "feature_extraction_n_jobs": 2,
+                },
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {"bag-of-words": {"lengths": [1]}, "length": {}},
+            }
+        )
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        pools = []
+        for _ in range(2):
+            model = TextModel(config)
+            model.initialize_resources(resource_loader, examples, labels)
+            model.get_feature_matrix(examples, labels, fit=True, return_groups=False)
+            pools.append(model_module._FEATURE_EXTRACTION_POOLS[2])
+
+        assert pools[0] is pools[1]
+        assert list(model_module._FEATURE_EXTRACTION_POOLS) == [2]
+
+        parallel, _ = pools[0]
+        model_module._close_feature_extraction_pools()
+        assert model_module._FEATURE_EXTRACTION_POOLS == {}
+        assert parallel._backend._pool is None
+
+    def test_fit_cv_warm_start_path(self, resource_loader):
+        """Tests fitting with param selection along a warm started n_estimators path"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "rforest"},
+                "param_selection": {
+                    "type": "k-fold",
+                    "k": 5,
+                    "grid": {"n_estimators": [20, 5, 10]},
+                },
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        assert model._current_params["n_estimators"] in [5, 10, 20]
+        assert len(model._clf.estimators_) == model._current_params["n_estimators"]
+
+    def test_warm_start_path_param(self):
+        """Tests that only ensemble size grids are searched along a warm start path"""
+        for classifier_type, grid, path_param in (
+            ("rforest", {"n_estimators": [5, 10]}, "n_estimators"),
+            ("rforest", {"max_depth": [None, 5]}, None),
+            ("logreg", {"C": [1, 10, 100]}, None),
+        ):
+            config = ModelConfig(
+                **{
+                    "model_type": "text",
+                    "example_type": QUERY_EXAMPLE_TYPE,
+                    "label_type": CLASS_LABEL_TYPE,
+                    "model_settings": {"classifier_type": classifier_type},
+                    "param_selection": {"type": "k-fold", "k": 5, "grid": grid},
+                    "features": {"bag-of-words": {"lengths": [1]}},
+                }
+            )
+            model = TextModel(config)
+            estimator, param_grid = model._get_cv_estimator_and_params(
+                model._get_model_constructor(), grid
+            )
+            assert _WarmStartPathSearchCV.get_path_param(estimator, param_grid) == path_param
+
+    def test_fit_cached_preprocessors(self, resource_loader, monkeypatch, tmpdir):
+        """Tests that a second fit with a cache_dir loads the fitted preprocessors from disk"""
+
+        def fit_predict(model_settings):
+            config = ModelConfig(
+                **{
+                    "model_type": "text",
+                    "example_type": QUERY_EXAMPLE_TYPE,
+                    "label_type": CLASS_LABEL_TYPE,
+                    "model_settings": model_settings,
+                    "params": {"fit_intercept": True, "C": 100},
+                    "features": {
+                        "bag-of-words": {"lengths": [1]},
+                        "freq": {"bins": 5},
+                        "length": {},
+                    },
+                }
+            )
+            model = TextModel(config)
+            examples = self.labeled_data.queries()
+            labels = self.labeled_data.intents()
+            model.initialize_resources(resource_loader, examples, labels)
+            model.fit(examples, labels)
+            queries = [markup.load_query(text).query for text in ("hi", "bye", "thanks")]
+            return model.predict_proba(queries)
+
+        # a fixed shuffle keeps the training data, and so the cache key, the same across fits
+        model_settings = {"classifier_type": "logreg", "random_state": 0}
+        expected_predictions = fit_predict(model_settings)
+
+        model_settings["cache_dir"] = str(tmpdir)
+        assert fit_predict(model_settings) == expected_predictions
+        assert os.listdir(str(tmpdir))
+
+        vectorizer_fits = []
+        fit_transform = DictVectorizer.fit_transform
+
+        def record_fit_transform(vectorizer, *args, **kwargs):
+            vectorizer_fits.append(vectorizer)
+            return fit_transform(vectorizer, *args, **kwargs)
+
+        monkeypatch.setattr(DictVectorizer, "fit_transform", record_fit_transform)
+        assert fit_predict(model_settings) == expected_predictions
+        assert vectorizer_fits == []
+
+    def test_fit_predict_many(self, resource_loader):
+        """Tests predicting several sets of examples at once after a fit"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        example_sets = [
+            [markup.load_query("hi").query, markup.load_query("bye").query],
+            [],
+            [markup.load_query("bye").query],
+        ]
+        predictions = model.predict_many(example_sets)
+        assert [list(prediction) for prediction in predictions] == [
+            ["greet", "exit"],
+            [],
+            ["exit"],
+        ]
+        proba_predictions = model.predict_proba_many(example_sets)
+        assert [len(prediction) for prediction in proba_predictions] == [2, 0, 1]
+        assert proba_predictions[2][0][0] == "exit"
+
+    def test_fit_predict_proba_top_k(self, resource_loader):
+        """Tests decoding only the most probable classes after a fit"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {
+                    "bag-of-words": {"lengths": [1]},
+                    "freq": {"bins": 5},
+                    "length": {},
+                },
+            }
+        )
+        model = TextModel(config)
+        examples = self.labeled_data.queries()
+        labels = self.labeled_data.intents()
+        model.initialize_resources(resource_loader, examples, labels)
+        model.fit(examples, labels)
+
+        queries = [markup.load_query(text).query for text in ("hi", "bye")]
+        predictions = model.predict_proba(queries)
+        top_predictions = model.predict_proba(queries, top_k=1)
+        for (top_class, probas), (k_top_class, k_probas) in zip(predictions, top_predictions):
+            assert k_top_class == top_class
+            assert k_probas == {top_class: probas[top_class]}
+
+        for top_k in (0, -1):
+            with pytest.raises(ValueError):
+                model.predict_proba(queries, top_k=top_k)
+            with pytest.raises(ValueError):
+                model.predict_log_proba(queries, top_k=top_k)
+
+    def test_feature_vectorizer_setting(self):
+        """Tests selecting the feature vectorizer with the feature_vectorizer model setting"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg", "feature_vectorizer": "hasher"},
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {"bag-of-words": {"lengths": [1]}},
+            }
+        )
+        vectorizer = TextModel(config)._feat_vectorizer
+        assert isinstance(vectorizer, FeatureHasher)
+        assert vectorizer.n_features == 2 ** TextModel.DEFAULT_HASH_BITS
+
+        config.model_settings["feature_vectorizer"] = "unknown"
+        with pytest.raises(ValueError):
+            TextModel(config)
+
+    def test_cv_backend_setting(self):
+        """Tests the default hyperparameter search backends and the cv_backend override"""
+        config = ModelConfig(
+            **{
+                "model_type": "text",
+                "example_type": QUERY_EXAMPLE_TYPE,
+                "label_type": CLASS_LABEL_TYPE,
+                "model_settings": {"classifier_type": "logreg"},
+                "params": {"fit_intercept": True, "C": 100},
+                "features": {"bag-of-words": {"lengths": [1]}},
+            }
+        )
+        for classifier_type, cv_backend in (
+            ("logreg", TextModel.THREADING_CV_BACKEND),
+            ("svm", TextModel.THREADING_CV_BACKEND),
+            ("rforest", TextModel.MULTIPROCESSING_CV_BACKEND),
+            ("dtree", TextModel.MULTIPROCESSING_CV_BACKEND),
+        ):
+            config.model_settings = {"classifier_type": classifier_type}
+            assert TextModel(config)._get_cv_backend() == cv_backend
+
+        config.model_settings = {
+            "classifier_type": "rforest",
+            "cv_backend": TextModel.THREADING_CV_BACKEND,
+        }
+        assert TextModel(config)._get_cv_backend() == TextModel.THREADING_CV_BACKEND